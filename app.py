@@ -6,6 +6,7 @@ import matplotlib.pyplot as plt
 from datetime import datetime
 from setup_database import get_connection
 from setup_database import hash_password
+from duplicate_detection import DuplicateIndex, start_background_sync
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -71,12 +72,26 @@ def login_user(username, password):
         return None, None
 
 
+# ======================
+# DUPLICATE INDEX (shared across sessions)
+# ======================
+@st.cache_resource
+def get_duplicate_index():
+    """Create the index once per server; a daemon thread builds and resyncs it."""
+    index = DuplicateIndex()
+    start_background_sync(index)
+    return index
+
+
 # ======================
 # STREAMLIT SETUP
 # ======================
 st.set_page_config(page_title="Client Query Management System", page_icon="📋")
 st.title("📋 Client Query Management System")
 
+# Start the background build early; pages never wait for it
+get_duplicate_index()
+
 menu = ["Login","Register"]
 choice = st.sidebar.radio("Select Action", menu)
 
@@ -131,6 +146,23 @@ elif choice == "Login":
         heading = st.text_input("Query Heading")
         description = st.text_area("Query Description")
 
+        # Suggest similar open queries before a duplicate ticket is raised
+        if heading or description:
+            try:
+                index = get_duplicate_index()
+                matches = index.find_similar(heading, description) if index.ready else []
+                if not index.ready:
+                    st.caption("⏳ Duplicate check is still loading — similar queries will appear shortly.")
+                elif matches:
+                    st.info("🔁 Similar open queries already exist — your issue may already be reported:")
+                    for match in matches:
+                        st.markdown(
+                            f"- **{match['query_id']}** · {match['heading']} — {match['description']} "
+                            f"(*{match['status']}*, {match['similarity']:.0%} match)"
+                        )
+            except Exception as e:
+                st.warning(f"⚠️ Could not check for similar queries: {e}")
+
         if st.button("Submit Query"):
             try:
                 conn = get_connection()
@@ -150,6 +182,12 @@ elif choice == "Login":
                 cursor.close()
                 conn.close()
                 st.success(f"✅ Query {query_id} submitted successfully!")
+
+                # The query is saved; an index failure must not look like a failed submit
+                try:
+                    get_duplicate_index().add(query_id, heading, description)
+                except Exception as e:
+                    st.warning(f"⚠️ Could not update duplicate index: {e}")
             except Exception as e:
                 st.error(f"⚠️ Error: {e}")
 
@@ -211,6 +249,8 @@ elif choice == "Login":
                 st.markdown("### ✅ Close a Query")
                 query_id = st.text_input("Enter Query ID to close:")
                 if st.button("Close Query"):
+                    # MySQL matches IDs case-insensitively; the index does not
+                    query_id = query_id.strip().upper()
                     conn = get_connection()
                     cursor = conn.cursor()
                     cursor.execute(
@@ -222,6 +262,11 @@ elif choice == "Login":
                     conn.close()
                     st.success(f"✅ Query {query_id} marked as Closed!")
 
+                    try:
+                        get_duplicate_index().remove(query_id)
+                    except Exception as e:
+                        st.warning(f"⚠️ Could not update duplicate index: {e}")
+
             except Exception as e:
                 st.error(f"⚠️ Error loading dashboard: {e}")
 
@@ -0,0 +1,416 @@
+import re
+import sys
+import zlib
+import random
+import time
+import threading
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from pathlib import Path
+
+# ✅ Load .env file from the same folder as the script
+load_dotenv(dotenv_path=Path(__file__).parent / ".env")
+
+
+# ============================================================
+# MinHash / LSH settings
+# ============================================================
+SHINGLE_SIZE = 4           # character n-grams per shingle
+NUM_BANDS = 24             # LSH bands
+ROWS_PER_BAND = 5          # MinHash values per band (24 x 5 = 120 hashes)
+SIMILARITY_THRESHOLD = 0.6  # minimum estimated Jaccard similarity to report
+MAX_SUGGESTIONS = 5
+MAX_CANDIDATES = 5000      # candidates scored per lookup (ranked by shared bands)
+RESYNC_INTERVAL = 60       # seconds between resyncs with client_queries
+RESYNC_OVERLAP = 300       # seconds re-read before the watermark (clock skew)
+
+_NUM_HASHES = NUM_BANDS * ROWS_PER_BAND
+_PRIME = (1 << 31) - 1
+
+# Fixed seed so signatures are identical across processes and restarts
+_rng = random.Random(20251018)
+_HASH_PARAMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(_NUM_HASHES)]
+_HASH_A = np.array([a for a, _ in _HASH_PARAMS], dtype=np.int64)
+_HASH_B = np.array([b for _, b in _HASH_PARAMS], dtype=np.int64)
+
+
+# ============================================================
+# Step 1: Text normalisation and MinHash signatures
+# ============================================================
+def normalize_text(heading, description):
+    """Lowercase heading + description and strip punctuation / extra spaces."""
+    # pd.isna also catches NaN from blank CSV cells (NaN is truthy, so `or ''` misses it)
+    parts = ["" if pd.isna(value) else str(value) for value in (heading, description)]
+    text = " ".join(parts).lower()
+    text = re.sub(r"[^a-z0-9]+", " ", text)
+    return text.strip()
+
+
+def minhash_signature(text):
+    """Return the MinHash signature (uint16 array) of a normalised text.
+
+    Only the low 16 bits of each MinHash value are kept (b-bit MinHash), which
+    quarters memory at 1M queries; accidental matches add ~1/65536 to a score.
+    """
+    if len(text) <= SHINGLE_SIZE:
+        shingles = {text}
+    else:
+        shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    hashes = np.fromiter((zlib.crc32(s.encode()) % _PRIME for s in shingles), dtype=np.int64, count=len(shingles))
+    # All operands are < 2^31, so a * h + b stays well inside int64
+    values = ((_HASH_A[:, None] * hashes[None, :] + _HASH_B[:, None]) % _PRIME).min(axis=1)
+    return (values & 0xFFFF).astype(np.uint16)
+
+
+def estimate_similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity = fraction of matching MinHash values."""
+    return np.count_nonzero(sig_a == sig_b) / _NUM_HASHES
+
+
+# ============================================================
+# Step 2: In-memory similarity index over open queries
+# ============================================================
+class DuplicateIndex:
+    """LSH index of open queries, updated incrementally on insert / close.
+
+    Queries with identical normalised text share one signature row, so
+    lookups only score distinct texts no matter how many copies are open.
+    Signatures live in one matrix so candidates are scored in a single
+    numpy comparison.
+    """
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self.last_synced = None
+        self._watermark = None     # DB time of the last successful sync
+        self._syncing = False
+        self._tombstones = set()   # IDs removed while a sync is running
+
+        self._text_of = {}         # query_id -> normalised text
+        self._details = {}         # query_id -> (heading, description)
+        self._ids_by_text = {}     # normalised text -> set of query_ids
+        self._slot_of = {}         # normalised text -> row in _signatures
+        self._text_at = []         # row -> normalised text (None when free)
+        self._free_slots = []
+        self._signatures = np.zeros((1024, _NUM_HASHES), dtype=np.uint16)
+        self._buckets = [{} for _ in range(NUM_BANDS)]  # band key -> set of rows
+
+    def __len__(self):
+        return len(self._text_of)
+
+    @property
+    def ready(self):
+        """True once the first sync with client_queries has finished."""
+        return self.last_synced is not None
+
+    def _bands(self, signature):
+        for band in range(NUM_BANDS):
+            start = band * ROWS_PER_BAND
+            yield band, signature[start:start + ROWS_PER_BAND].tobytes()
+
+    def add(self, query_id, heading, description):
+        """Index an open query (re-indexes it if the ID already exists)."""
+        text = normalize_text(heading, description)
+        signature = None if text in self._slot_of else minhash_signature(text)
+        with self._lock:
+            self._tombstones.discard(query_id)
+            self._insert(query_id, heading, description, text, signature)
+
+    def remove(self, query_id):
+        """Drop a query from the index (e.g. when it is closed)."""
+        with self._lock:
+            if self._syncing:
+                self._tombstones.add(query_id)
+            self._discard(query_id)
+
+    def _insert(self, query_id, heading, description, text, signature):
+        self._discard(query_id)
+        self._text_of[query_id] = text
+        self._details[query_id] = (heading, description)
+        ids = self._ids_by_text.get(text)
+        if ids:
+            ids.add(query_id)
+            return
+        self._ids_by_text[text] = {query_id}
+        if signature is None:  # text was dropped between the check and the lock
+            signature = minhash_signature(text)
+
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            self._text_at[slot] = text
+        else:
+            slot = len(self._text_at)
+            self._text_at.append(text)
+            if slot == len(self._signatures):
+                grown = np.zeros((2 * len(self._signatures), _NUM_HASHES), dtype=np.uint16)
+                grown[:slot] = self._signatures
+                self._signatures = grown
+        self._signatures[slot] = signature
+        self._slot_of[text] = slot
+        for band, key in self._bands(signature):
+            self._buckets[band].setdefault(key, set()).add(slot)
+
+    def _discard(self, query_id):
+        text = self._text_of.pop(query_id, None)
+        if text is None:
+            return
+        del self._details[query_id]
+        ids = self._ids_by_text[text]
+        ids.discard(query_id)
+        if ids:
+            return
+        del self._ids_by_text[text]
+        slot = self._slot_of.pop(text)
+        for band, key in self._bands(self._signatures[slot]):
+            bucket = self._buckets[band][key]
+            bucket.discard(slot)
+            if not bucket:
+                del self._buckets[band][key]
+        self._text_at[slot] = None
+        self._free_slots.append(slot)
+
+    def _score_candidates(self, signature):
+        """Return (rows, scores) of indexed texts at or above the threshold."""
+        buckets = [self._buckets[band].get(key) for band, key in self._bands(signature)]
+        buckets = [bucket for bucket in buckets if bucket]
+        if not buckets:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        if sum(len(bucket) for bucket in buckets) <= MAX_CANDIDATES:
+            rows = np.fromiter(set().union(*buckets), dtype=np.int64)
+        else:
+            # Too many weak matches: keep the rows sharing the most bands with the query
+            hits = np.concatenate([np.fromiter(bucket, dtype=np.int64, count=len(bucket)) for bucket in buckets])
+            rows, counts = np.unique(hits, return_counts=True)
+            if len(rows) > MAX_CANDIDATES:
+                rows = rows[np.argpartition(-counts, MAX_CANDIDATES)[:MAX_CANDIDATES]]
+
+        scores = np.count_nonzero(self._signatures[rows] == signature, axis=1) / _NUM_HASHES
+        keep = scores >= self.threshold
+        return rows[keep], scores[keep]
+
+    def find_similar(self, heading, description, limit=MAX_SUGGESTIONS):
+        """Return open queries similar to the text, best match first.
+
+        Each match is a dict with query_id, heading, description, status and similarity.
+        """
+        text = normalize_text(heading, description)
+        if not text:
+            return []
+        signature = minhash_signature(text)
+
+        with self._lock:
+            rows, scores = self._score_candidates(signature)
+            order = np.argsort(-scores, kind="stable")
+
+            matches = []
+            for i in order:
+                score = float(scores[i])
+                for query_id in sorted(self._ids_by_text[self._text_at[rows[i]]]):
+                    match_heading, match_description = self._details[query_id]
+                    matches.append({
+                        "query_id": query_id,
+                        "heading": match_heading,
+                        "description": match_description,
+                        "status": "Open",
+                        "similarity": score,
+                    })
+                    if len(matches) >= limit:
+                        return matches
+            return matches
+
+    def duplicate_groups(self):
+        """Yield sorted query_id lists of queries whose normalised text is identical."""
+        with self._lock:
+            groups = [sorted(ids) for ids in self._ids_by_text.values()]
+        yield from groups
+
+    def similar_pairs(self):
+        """Yield (ids_a, ids_b, similarity) for distinct indexed texts above the threshold.
+
+        ids_a / ids_b are the sorted query_id lists sharing each text; every
+        pair of texts is reported once.
+        """
+        pairs = []
+        with self._lock:
+            for slot, text in enumerate(self._text_at):
+                if text is None:
+                    continue
+                rows, scores = self._score_candidates(self._signatures[slot])
+                ids_a = sorted(self._ids_by_text[text])
+                for row, score in zip(rows, scores):
+                    if row > slot:
+                        pairs.append((ids_a, sorted(self._ids_by_text[self._text_at[row]]), float(score)))
+        yield from pairs
+
+    def sync_from_db(self):
+        """Bring the index in line with the open rows in client_queries.
+
+        The first call (or a drift in the open-query count) reads every open
+        row; later calls only read rows created or closed since the last sync.
+        Picks up queries inserted or closed outside this process (import_csv.py,
+        other app workers, manual SQL).
+        """
+        from setup_database import get_connection
+
+        if not self._sync_lock.acquire(blocking=False):
+            return  # another thread is already syncing
+        with self._lock:
+            self._syncing = True
+            self._tombstones.clear()
+        conn = None
+        try:
+            conn = get_connection()
+            cursor = conn.cursor()
+            cursor.execute("SELECT NOW()")
+            db_now = cursor.fetchone()[0]
+
+            full_scan = self._watermark is None
+            if not full_scan:
+                since = self._watermark - timedelta(seconds=RESYNC_OVERLAP)
+                cursor.execute(
+                    "SELECT query_id, query_heading, query_description FROM client_queries "
+                    "WHERE status = 'Open' AND query_created_time >= %s",
+                    (since,)
+                )
+                for query_id, heading, description in cursor.fetchall():
+                    if query_id not in self._text_of:
+                        self._add_from_sync(query_id, heading, description)
+
+                cursor.execute(
+                    "SELECT query_id FROM client_queries WHERE status = 'Closed' AND query_closed_time >= %s",
+                    (since,)
+                )
+                for (query_id,) in cursor.fetchall():
+                    self.remove(query_id)
+
+                # Rows imported with old timestamps or closed by hand slip past the watermark
+                cursor.execute("SELECT COUNT(*) FROM client_queries WHERE status = 'Open'")
+                full_scan = cursor.fetchone()[0] != len(self)
+
+            if full_scan:
+                with self._lock:
+                    indexed_before = set(self._text_of)
+                cursor.execute(
+                    "SELECT query_id, query_heading, query_description FROM client_queries WHERE status = 'Open'"
+                )
+                open_ids = set()
+                for query_id, heading, description in cursor:
+                    open_ids.add(query_id)
+                    if query_id not in indexed_before:
+                        self._add_from_sync(query_id, heading, description)
+
+                # Only drop IDs that were indexed before the snapshot, so queries
+                # submitted mid-sync are not removed by mistake
+                for query_id in indexed_before - open_ids:
+                    self.remove(query_id)
+
+            cursor.close()
+            self._watermark = db_now
+            self.last_synced = time.monotonic()
+        finally:
+            if conn is not None:
+                conn.close()
+            with self._lock:
+                self._syncing = False
+                self._tombstones.clear()
+            self._sync_lock.release()
+
+    def _add_from_sync(self, query_id, heading, description):
+        """Add a row read by sync_from_db unless it was closed since the read."""
+        text = normalize_text(heading, description)
+        signature = None if text in self._slot_of else minhash_signature(text)
+        with self._lock:
+            if query_id not in self._tombstones:
+                self._insert(query_id, heading, description, text, signature)
+
+
+def start_background_sync(index, interval=RESYNC_INTERVAL):
+    """Build the index and keep resyncing it on a daemon thread."""
+    def run():
+        while True:
+            try:
+                index.sync_from_db()
+            except Exception as e:
+                print(f"⚠️ Duplicate index sync failed: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name="duplicate-index-sync", daemon=True)
+    thread.start()
+    return thread
+
+
+# ============================================================
+# Step 3: Batch mode — cluster duplicates across a CSV
+# ============================================================
+def find_duplicate_clusters(df, threshold=SIMILARITY_THRESHOLD):
+    """Group rows of a query DataFrame into clusters of near-duplicates.
+
+    Returns a list of query_id lists (largest first); singletons are omitted.
+    """
+    index = DuplicateIndex(threshold)
+    for row in df.itertuples(index=False):
+        index.add(row.query_id, row.query_heading, row.query_description)
+
+    # Union-find over query IDs: identical texts first, then similar text pairs
+    parent = {}
+
+    def find(query_id):
+        parent.setdefault(query_id, query_id)
+        while parent[query_id] != query_id:
+            parent[query_id] = parent[parent[query_id]]
+            query_id = parent[query_id]
+        return query_id
+
+    for ids in index.duplicate_groups():
+        for query_id in ids:
+            parent[find(query_id)] = find(ids[0])
+    for ids_a, ids_b, _ in index.similar_pairs():
+        parent[find(ids_a[0])] = find(ids_b[0])
+
+    groups = {}
+    for query_id in parent:
+        groups.setdefault(find(query_id), []).append(query_id)
+
+    clusters = [sorted(ids) for ids in groups.values() if len(ids) > 1]
+    clusters.sort(key=lambda ids: (-len(ids), ids[0]))
+    return clusters
+
+
+def report_csv_duplicates(csv_path="client_data.csv", output_path=None):
+    """Print near-duplicate clusters found in a CSV and optionally save them."""
+    df = pd.read_csv(csv_path)
+    print(f"📄 Loaded CSV: {csv_path} ({len(df)} rows)")
+
+    clusters = find_duplicate_clusters(df)
+    duplicates = sum(len(ids) - 1 for ids in clusters)
+    print(f"🔍 {len(clusters)} duplicate clusters found ({duplicates} redundant rows).")
+
+    by_id = df.set_index("query_id")
+    for ids in clusters[:10]:
+        sample = by_id.loc[ids[0]]
+        print(f"  • {len(ids):>4} × {sample['query_heading']}: {sample['query_description']}")
+
+    if output_path:
+        rows = [
+            {"cluster_id": n, "query_id": query_id}
+            for n, ids in enumerate(clusters, start=1)
+            for query_id in ids
+        ]
+        pd.DataFrame(rows, columns=["cluster_id", "query_id"]).to_csv(output_path, index=False)
+        print(f"💾 Cluster assignments saved to {output_path}")
+
+    return clusters
+
+
+# ============================================================
+# Step 4: Run batch report
+# ============================================================
+if __name__ == "__main__":
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else "client_data.csv"
+    output_path = sys.argv[2] if len(sys.argv) > 2 else None
+    report_csv_duplicates(csv_path, output_path)
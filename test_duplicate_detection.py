@@ -0,0 +1,163 @@
+import sys
+import types
+from datetime import datetime
+
+import pandas as pd
+
+import duplicate_detection as dd
+
+
+# ============================================================
+# Normalisation
+# ============================================================
+def test_normalize_text_treats_missing_values_as_empty():
+    assert dd.normalize_text("Bug", float("nan")) == "bug"
+    assert dd.normalize_text(None, "Login  FAILS!") == "login fails"
+    assert dd.normalize_text(float("nan"), None) == ""
+
+
+# ============================================================
+# Index add / remove / find_similar
+# ============================================================
+def test_add_and_remove_with_shared_text():
+    index = dd.DuplicateIndex()
+    index.add("Q0001", "Bug Report", "Form validation not working properly.")
+    index.add("Q0002", "bug report", "Form validation not working properly")
+    assert len(index) == 2
+
+    index.remove("Q0001")
+    matches = index.find_similar("Bug Report", "Form validation not working properly.")
+    assert [m["query_id"] for m in matches] == ["Q0002"]
+
+    index.remove("Q0002")
+    assert len(index) == 0
+    assert index.find_similar("Bug Report", "Form validation not working properly.") == []
+
+
+def test_find_similar_orders_by_similarity_and_respects_limit():
+    index = dd.DuplicateIndex()
+    for n in range(1, 4):
+        index.add(f"Q000{n}", "Bug Report", "Form validation not working properly.")
+    index.add("Q0004", "Bug Report", "Form validation is not working")
+    index.add("Q0005", "Payment Failure", "Payment success mail delayed.")
+
+    matches = index.find_similar("Bug Report", "Form validation not working properly.", limit=10)
+    assert [m["query_id"] for m in matches] == ["Q0001", "Q0002", "Q0003", "Q0004"]
+    assert matches[0]["similarity"] == 1.0
+    assert matches[0]["similarity"] > matches[-1]["similarity"] >= dd.SIMILARITY_THRESHOLD
+    assert matches[0]["description"] == "Form validation not working properly."
+    assert matches[0]["status"] == "Open"
+
+    limited = index.find_similar("Bug Report", "Form validation not working properly.", limit=2)
+    assert [m["query_id"] for m in limited] == ["Q0001", "Q0002"]
+
+
+def test_find_similar_ignores_unrelated_text():
+    index = dd.DuplicateIndex()
+    index.add("Q0001", "Bug Report", "Tab focus jumps incorrectly.")
+    assert index.find_similar("Data Export", "Need monthly data dump in CSV.") == []
+    assert index.find_similar("", "") == []
+
+
+# ============================================================
+# Batch clustering
+# ============================================================
+def test_find_duplicate_clusters():
+    df = pd.DataFrame({
+        "query_id": ["Q0001", "Q0002", "Q0003", "Q0004", "Q0005", "Q0006"],
+        "query_heading": ["Bug Report", "Bug Report", "Bug Report", "Data Export", None, "UI Feedback"],
+        "query_description": [
+            "Form validation not working properly.",
+            "Form validation not working properly.",
+            "Form validation is not working",
+            "Need monthly data dump in CSV.",
+            float("nan"),
+            float("nan"),
+        ],
+    })
+    # Rows with missing fields must not cluster on a shared "nan" token
+    assert dd.find_duplicate_clusters(df) == [["Q0001", "Q0002", "Q0003"]]
+
+
+# ============================================================
+# Sync with client_queries (fake connection, no MySQL)
+# ============================================================
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.rows = []
+
+    def execute(self, sql, params=()):
+        self.db.on_execute(sql)
+        if sql.startswith("SELECT NOW()"):
+            self.rows = [(datetime(2025, 1, 1),)]
+        elif sql.startswith("SELECT COUNT(*)"):
+            self.rows = [(sum(status == "Open" for status, *_ in self.db.rows.values()),)]
+        elif "status = 'Closed'" in sql:
+            self.rows = [(qid,) for qid, (status, *_) in self.db.rows.items() if status == "Closed"]
+        else:
+            self.rows = [(qid, h, d) for qid, (status, h, d) in self.db.rows.items() if status == "Open"]
+
+    def fetchone(self):
+        return self.rows[0]
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def __iter__(self):
+        return iter(list(self.rows))
+
+    def close(self):
+        pass
+
+
+class FakeDB:
+    def __init__(self, rows):
+        self.rows = rows  # query_id -> (status, heading, description)
+        self.on_execute = lambda sql: None
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        pass
+
+
+def use_fake_db(monkeypatch, db):
+    module = types.ModuleType("setup_database")
+    module.get_connection = lambda: db
+    monkeypatch.setitem(sys.modules, "setup_database", module)
+
+
+def test_sync_from_db_adds_and_removes(monkeypatch):
+    db = FakeDB({
+        "Q0001": ("Open", "Bug Report", "Tab focus jumps incorrectly."),
+        "Q0002": ("Closed", "Bug Report", "Form validation not working properly."),
+    })
+    use_fake_db(monkeypatch, db)
+
+    index = dd.DuplicateIndex()
+    index.sync_from_db()
+    assert index.ready
+    assert [m["query_id"] for m in index.find_similar("Bug Report", "Tab focus jumps incorrectly.")] == ["Q0001"]
+
+    db.rows["Q0001"] = ("Closed", "Bug Report", "Tab focus jumps incorrectly.")
+    db.rows["Q0003"] = ("Open", "Data Export", "Export email not received.")
+    index.sync_from_db()
+    assert index.find_similar("Bug Report", "Tab focus jumps incorrectly.") == []
+    assert [m["query_id"] for m in index.find_similar("Data Export", "Export email not received.")] == ["Q0003"]
+
+
+def test_query_closed_during_sync_is_not_re_added(monkeypatch):
+    db = FakeDB({"Q0001": ("Open", "Bug Report", "Tab focus jumps incorrectly.")})
+    use_fake_db(monkeypatch, db)
+    index = dd.DuplicateIndex()
+
+    def close_after_select(sql):
+        # Support closes Q0001 after the full scan has read it as Open
+        if sql.startswith("SELECT query_id, query_heading"):
+            index.remove("Q0001")
+
+    db.on_execute = close_after_select
+    index.sync_from_db()
+    assert len(index) == 0